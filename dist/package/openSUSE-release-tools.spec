@@ -220,6 +220,7 @@ BuildArch:      noarch
 Requires:       osc-plugin-origin = %{version}
 Requires:       osc-plugin-staging = %{version}
 Requires(pre):  shadow
+Suggests:       python3-orjson
 
 %description obs-operator
 Server used to perform staging operations as a service instead of requiring
@@ -3,54 +3,231 @@
 # kubernetes logs.
 
 import argparse
-import http
-from http.cookies import SimpleCookie
-from http.cookiejar import Cookie, LWPCookieJar
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.cookiejar import join_header_words
 from http.server import BaseHTTPRequestHandler, HTTPServer
-from socketserver import ThreadingMixIn
-import json
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+import logging
+import multiprocessing
+import multiprocessing.forkserver
 import tempfile
 import os
+from osc import babysitter
+from osc import commandline
 from osc import conf
 from osclib import common
 from osclib.sentry import sentry_client
 from osclib.sentry import sentry_init
+import re
+import socket
 import subprocess
 import sys
 import time
+from urllib.parse import unquote_plus
 from urllib.parse import urlparse
-from urllib.parse import parse_qs
-
-# A cookie with an invalid key is intermittently generated on opensuse.org
-# domain which causes the operator to crash when parsing the cookie. The desired
-# cookie is valid, but cannot be utilize due to the exception. As suggested in
-# https://stackoverflow.com/a/47012250, workaround by making EVERYTHING LEGAL!
-http.cookies._is_legal_key = lambda _: True
 
+logger = logging.getLogger(__name__)
 sentry_sdk = sentry_init()
 
-# Available in python 3.7.
-class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+# Pre-encoded static response fragments.
+B_FAILED = b'failed'
+B_DOLLAR = b'$ '
+B_NL = b'\n'
+B_ROOT = ''.join([
+    'namespace: {}\n'.format(common.NAME),
+    'name: {}\n'.format('OBS Operator'),
+    'version: {}\n'.format(common.VERSION),
+]).encode('utf-8')
+
+# Linear time replacement for http.cookies._unquote() as fixed in Python 3.13
+# (CVE-2024-7592), since older releases are quadratic on crafted input.
+_unquote_sub = re.compile(r'\\(?:([0-3][0-7][0-7])|(.))').sub
+
+def _unquote_replace(match):
+    if match[1]:
+        return chr(int(match[1], 8))
+    return match[2]
+
+def _unquote(value):
+    if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+        return value
+    return _unquote_sub(_unquote_replace, value[1:-1])
+
+def _cookie_split(header_value):
+    # Split on ';' outside of quoted values in a single pass.
+    parts = []
+    start = 0
+    quoted = escaped = False
+    for i, char in enumerate(header_value):
+        if escaped:
+            escaped = False
+        elif quoted:
+            if char == '\\':
+                escaped = True
+            elif char == '"':
+                quoted = False
+        elif char == '"':
+            quoted = True
+        elif char == ';':
+            parts.append(header_value[start:i])
+            start = i + 1
+    parts.append(header_value[start:])
+    return parts
+
+def _extract_session_cookie(header_value, name):
+    # Only a single cookie is of interest so scan for it directly rather than
+    # parsing the entire header via SimpleCookie. This also tolerates cookies
+    # with invalid keys which are intermittently generated on opensuse.org
+    # domain and would otherwise cause SimpleCookie to fail.
+    if '"' in header_value:
+        # Quoted values may contain ';'.
+        parts = _cookie_split(header_value)
+    else:
+        parts = header_value.split(';')
+
+    session = None
+    for part in parts:
+        key, _, value = part.strip().partition('=')
+        if key == name:
+            # Last occurrence wins, as with SimpleCookie.
+            session = value.strip()
+
+    return _unquote(session) if session else session
+
+def _domain_parent(domain):
+    # Last two labels of domain without building an intermediate list.
+    head, sep, last = domain.rpartition('.')
+    if not sep:
+        return domain
+
+    return '{}.{}'.format(head.rpartition('.')[2], last)
+
+@lru_cache(maxsize=64)
+def _accept_format(accept):
+    # Use the first media range with a supported subtype.
+    for media_range in accept.split(','):
+        subtype = media_range.partition(';')[0].strip().partition('/')[2]
+        if subtype in ('json', 'yaml'):
+            return subtype
+
+    return None
+
+def _split_path_query(request_path):
+    # Lightweight equivalent of urlparse() for request paths.
+    path, _, query_string = request_path.partition('#')[0].partition('?')
+    return path.lstrip('/'), query_string
+
+def _split_path_prefix(path):
+    # Equivalent to '/'.join(path.split('/')[:2]) and the remainder, if any,
+    # without splitting the entire path.
+    first = path.find('/')
+    second = path.find('/', first + 1) if first != -1 else -1
+    if second == -1:
+        return path, None
+    return path[:second], path[second + 1:]
+
+def _parse_query(query_string):
+    # Lightweight equivalent of parse_qs() which also discards blank values.
+    query = {}
+    for pair in query_string.split('&'):
+        key, _, value = pair.partition('=')
+        if value:
+            query.setdefault(unquote_plus(key), []).append(unquote_plus(value))
+
+    return query
+
+def osc_run(argv, connection):
+    """Execute osc within a forkserver child writing output to connection."""
+    os.dup2(connection.fileno(), 1)
+    os.dup2(connection.fileno(), 2)
+    connection.close()
+    # Fresh streams to avoid inheriting any buffered output.
+    sys.stdout = open(1, 'w', encoding='utf-8', closefd=False)
+    sys.stderr = open(2, 'w', encoding='utf-8', closefd=False)
+
+    try:
+        # Same as the osc entry point, which translates errors like an expired
+        # session or oscerr.* into normal messages.
+        result = babysitter.run(commandline.Osc(), argv)
+    except SystemExit as e:
+        result = e.code
+    sys.exit(0 if not result else 1)
+
+class MemoryTemporaryFile(object):
+    """Anonymous in-memory file with a path usable by subprocesses."""
+
+    def __init__(self, name):
+        fd = os.memfd_create(name)
+        self.file = os.fdopen(fd, 'w+b')
+        # Referencing the parent process allows the path to be resolved from
+        # within subprocesses without needing to pass the descriptor.
+        self.name = '/proc/{}/fd/{}'.format(os.getpid(), fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.file.close()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+def temporary_file(name):
+    # Avoid filesystem churn where memfd is available (Linux).
+    if hasattr(os, 'memfd_create'):
+        return MemoryTemporaryFile(name)
+
+    return tempfile.NamedTemporaryFile(prefix=name)
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTP server handling requests using a bounded pool of threads."""
+
+    def __init__(self, server_address, RequestHandlerClass, workers=32):
+        super().__init__(server_address, RequestHandlerClass)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        # Same as ThreadingMixIn.process_request_thread().
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
     def handle_error(self, request, client_address):
         super().handle_error(request, client_address)
         sentry_sdk.capture_exception()
 
 class RequestHandler(BaseHTTPRequestHandler):
     COOKIE_NAME = 'openSUSE_session' # Both OBS and IBS.
-    GET_PATHS = [
-        'origin/config',
-        'origin/history',
-        'origin/list',
-        'origin/package',
-        'origin/potentials',
-        'origin/projects',
-        'origin/report',
-        'package/diff',
-    ]
-    POST_PATHS = [
-        'request/submit',
-        'staging/select',
-    ]
+    # Applied to the connection socket by StreamRequestHandler so that idle or
+    # stalled clients release their worker in the bounded thread pool.
+    timeout = 60
+    # Defense-in-depth against crafted input, refuse to parse unreasonably
+    # large headers.
+    COOKIE_MAX_LENGTH = 8192
+    LWP_TEMPLATE = ('#LWP-Cookies-2.0\n'
+        'Set-Cookie3: {cookie}; path="/"; domain=""; path_spec; domain_dot; secure; version=0\n')
+    # Values derived from Host and Origin headers which rarely vary.
+    HEADER_CACHE_SIZE = 256
+    _APIURL_CACHE = {}
+    _ORIGIN_CACHE = {}
+    # Set once writing to the client fails during execute().
+    client_disconnected = False
+    # Tuple of (Cookie header, session value) from the last parse.
+    _parsed_cookie = None
 
     def do_OPTIONS(self):
         try:
@@ -62,78 +239,72 @@ class RequestHandler(BaseHTTPRequestHandler):
         self.end_headers()
 
     def do_GET(self):
-        url_parts = urlparse(self.path)
-
-        path = url_parts.path.lstrip('/')
-        path_parts = path.split('/')
-        path_prefix = '/'.join(path_parts[:2])
-
-        query = parse_qs(url_parts.query)
+        path, query_string = _split_path_query(self.path)
+        path_prefix, path_rest = _split_path_prefix(path)
 
         if path_prefix == '':
             self.send_response(200)
             self.send_header('Content-type', 'text/plain')
             self.end_headers()
 
-            self.write_string('namespace: {}\n'.format(common.NAME))
-            self.write_string('name: {}\n'.format('OBS Operator'))
-            self.write_string('version: {}\n'.format(common.VERSION))
+            self.write_bytes(B_ROOT)
             return
 
-        if len(path_parts) < 3 or path_prefix not in self.GET_PATHS:
+        func = self.GET_HANDLERS.get(path_prefix)
+        if path_rest is None or func is None:
             self.send_response(404)
             self.end_headers()
             return
 
+        args = path_rest.split('/')
+        query = _parse_query(query_string)
+
         try:
             with OSCRequestEnvironment(self) as oscrc_file:
-                func = getattr(self, 'handle_{}'.format(path_prefix.replace('/', '_')))
-                command = func(path_parts[2:], query)
+                command = func(self, args, query)
 
                 self.end_headers()
-                if command and not self.execute(oscrc_file, command):
-                    self.write_string('failed')
+                if command and not self.execute(oscrc_file, command) and not self.client_disconnected:
+                    self.write_bytes(B_FAILED)
         except OSCRequestEnvironmentException as e:
             self.write_string(str(e))
 
     def do_POST(self):
-        url_parts = urlparse(self.path)
+        path, query_string = _split_path_query(self.path)
+        path_prefix, path_rest = _split_path_prefix(path)
 
-        path = url_parts.path.lstrip('/')
-        path_parts = path.split('/')
-        path_prefix = '/'.join(path_parts[:2])
-
-        query = parse_qs(url_parts.query)
-
-        if len(path_parts) < 2 or path_prefix not in self.POST_PATHS:
+        func = self.POST_HANDLERS.get(path_prefix)
+        if func is None:
             self.send_response(404)
             self.end_headers()
             return
 
+        args = path_rest.split('/') if path_rest is not None else []
+        query = _parse_query(query_string)
+
         data = self.data_parse()
         user = data.get('user')
-        if self.debug:
-            print('data: {}'.format(data))
+        logger.debug('data: %s', data)
 
         try:
             with OSCRequestEnvironment(self, user) as oscrc_file:
-                func = getattr(self, 'handle_{}'.format(path_prefix.replace('/', '_')))
-                commands = func(path_parts[2:], query, data)
+                commands = func(self, args, query, data)
                 self.end_headers()
 
                 for command in commands:
-                    self.write_string('$ {}\n'.format(' '.join(command)))
+                    self.write_bytes(B_DOLLAR + ' '.join(command).encode('utf-8') + B_NL)
                     if not self.execute(oscrc_file, command):
-                        self.write_string('failed')
+                        if not self.client_disconnected:
+                            self.write_bytes(B_FAILED)
                         break
         except OSCRequestEnvironmentException as e:
             self.write_string(str(e))
 
     def data_parse(self):
-        if int(self.headers['Content-Length']) == 0:
+        content_length = int(self.headers.get('Content-Length') or 0)
+        if content_length == 0:
             return {}
-        data = self.rfile.read(int(self.headers['Content-Length']))
-        return json.loads(data.decode('utf-8'))
+        return json_loads(self.rfile.read(content_length))
 
     def apiurl_get(self):
         if self.apiurl:
@@ -143,91 +314,176 @@ class RequestHandler(BaseHTTPRequestHandler):
         if not host:
             return None
 
+        try:
+            return self._APIURL_CACHE[host]
+        except KeyError:
+            pass
+
+        apiurl = None
         # Strip port if present.
         domain = host.split(':', 2)[0]
-        if '.' not in domain:
-            return None
+        if '.' in domain:
+            # Remove first subdomain and replace with api subdomain.
+            domain_parent = _domain_parent(domain)
+            apiurl = 'https://api.{}'.format(domain_parent)
 
-        # Remove first subdomain and replace with api subdomain.
-        domain_parent = '.'.join(domain.split('.')[-2:])
-        return 'https://api.{}'.format(domain_parent)
+        self.header_cache_set(self._APIURL_CACHE, host, apiurl)
+        return apiurl
 
     def origin_domain_get(self):
         origin = self.headers.get('Origin')
-        if origin is not None:
-            # Strip port if present.
-            domain = urlparse(origin).netloc.split(':', 2)[0]
-            if '.' in domain:
-                return '.'.join(domain.split('.')[-2:])
+        if origin is None:
+            return None
 
-        return None
+        try:
+            return self._ORIGIN_CACHE[origin]
+        except KeyError:
+            pass
+
+        origin_domain = None
+        # Strip port if present.
+        domain = urlparse(origin).netloc.split(':', 2)[0]
+        if '.' in domain:
+            origin_domain = _domain_parent(domain)
+
+        self.header_cache_set(self._ORIGIN_CACHE, origin, origin_domain)
+        return origin_domain
+
+    @classmethod
+    def header_cache_set(cls, cache, key, value):
+        # Headers are client controlled so bound the size of the cache.
+        if len(cache) >= cls.HEADER_CACHE_SIZE:
+            cache.clear()
+        cache[key] = value
 
     def session_get(self):
         if self.session:
             return self.session
         else:
             cookie = self.headers.get('Cookie')
-            if cookie:
-                cookie = SimpleCookie(cookie)
-                if self.COOKIE_NAME in cookie:
-                    return cookie[self.COOKIE_NAME].value
+            if cookie and len(cookie) <= self.COOKIE_MAX_LENGTH:
+                # Avoid parsing again should session_get() be called more than
+                # once for a request. Keyed by header value in case keep-alive
+                # (HTTP/1.1) is enabled and a handler serves multiple requests.
+                if self._parsed_cookie is None or self._parsed_cookie[0] != cookie:
+                    self._parsed_cookie = (cookie, _extract_session_cookie(cookie, self.COOKIE_NAME))
+                return self._parsed_cookie[1]
 
         return None
 
-    def oscrc_create(self, oscrc_file, apiurl, cookiejar_file, user):
-        sentry_dsn = sentry_client().dsn
-        sentry_environment = sentry_client().options.get('environment')
+    @classmethod
+    def oscrc_template_build(cls):
+        # Only the static portion is formatted here, braces within which need to
+        # be escaped to survive the per-request format().
+        def escape(value):
+            return str(value).replace('{', '{{').replace('}', '}}')
 
-        oscrc_file.write('\n'.join([
+        return '\n'.join([
             '[general]',
             # Passthru sentry_sdk options to allow for reporting on subcommands.
-            'sentry_sdk.dsn = {}'.format(sentry_dsn) if sentry_dsn else '',
-            'sentry_sdk.environment = {}'.format(sentry_environment) if sentry_environment else '',
-            'apiurl = {}'.format(apiurl),
-            'cookiejar = {}'.format(cookiejar_file.name),
+            'sentry_sdk.dsn = {}'.format(escape(cls.sentry_dsn)) if cls.sentry_dsn else '',
+            'sentry_sdk.environment = {}'.format(escape(cls.sentry_environment)) if cls.sentry_environment else '',
+            'apiurl = {apiurl}',
+            'cookiejar = {cookiejar}',
             'staging.color = 0',
-            '[{}]'.format(apiurl),
-            'user = {}'.format(user),
+            '[{apiurl}]',
+            'user = {user}',
             'pass = invalid',
             '',
-        ]).encode('utf-8'))
+        ])
+
+    def oscrc_create(self, oscrc_file, apiurl, cookiejar_file, user):
+        oscrc_file.write(self.oscrc_template.format(
+            apiurl=apiurl, cookiejar=cookiejar_file.name, user=user).encode('utf-8'))
         oscrc_file.flush()
 
         # In order to avoid osc clearing the cookie file the modified time of
         # the oscrc file must be set further into the past.
         # if int(round(config_mtime)) > int(os.stat(cookie_file).st_mtime):
         recent_past = time.time() - 3600
-        os.utime(oscrc_file.name, (recent_past, recent_past))
+        os.utime(oscrc_file.fileno(), (recent_past, recent_past))
 
     def cookiejar_create(self, cookiejar_file, session):
-        cookie_jar = LWPCookieJar(cookiejar_file.name)
-        cookie_jar.set_cookie(Cookie(0, self.COOKIE_NAME, session,
-            None, False,
-            '', False, True,
-            '/', True,
-            True,
-            None, None, None, None, {}))
-        cookie_jar.save()
+        # Equivalent to LWPCookieJar.save() for the single session cookie.
+        cookiejar_file.write(self.LWP_TEMPLATE.format(
+            cookie=join_header_words([[(self.COOKIE_NAME, session)]])).encode('utf-8'))
         cookiejar_file.flush()
 
     def execute(self, oscrc_file, command):
-        env = os.environ
+        if self.in_process:
+            return self.execute_in_process(oscrc_file, command)
+
+        # Copy to avoid requests in other threads overwriting OSC_CONFIG.
+        env = os.environ.copy()
         env['OSC_CONFIG'] = oscrc_file.name
 
-        # Would be preferrable to stream incremental output, but python http
-        # server does not seem to support this easily.
-        result = subprocess.run(command, env=env, stdout=self.wfile, stderr=self.wfile)
-        return result.returncode == 0
+        with subprocess.Popen(command, env=env, bufsize=0,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
+            if not self.output_stream(proc.stdout):
+                proc.kill()
+                return False
+
+        return proc.returncode == 0
+
+    def execute_in_process(self, oscrc_file, command):
+        # Avoid the interpreter startup and import cost of a subprocess by
+        # forking from a single-threaded forkserver with osc preloaded rather
+        # than from this multi-threaded process. Each child has its own osc
+        # module state (config, opener, cookiejar) and standard streams.
+        argv = [command[0], '--config', oscrc_file.name] + command[1:]
+
+        reader, writer = self.forkserver.Pipe(duplex=False)
+        process = self.forkserver.Process(target=osc_run, args=(argv, writer), daemon=True)
+        process.start()
+        writer.close()
+        try:
+            with open(reader.fileno(), 'rb', buffering=0, closefd=False) as pipe:
+                if not self.output_stream(pipe):
+                    process.kill()
+                    return False
+        finally:
+            reader.close()
+            process.join()
+
+        return process.exitcode == 0
+
+    def output_stream(self, pipe):
+        # Stream output to the client as it is produced rather than once the
+        # command completes.
+        try:
+            for chunk in iter(lambda: pipe.read(4096), b''):
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, socket.timeout):
+            # Client disconnected or stalled so there is no point in continuing
+            # nor anything worth reporting.
+            self.client_disconnected = True
+            return False
+
+        return True
 
     def write_string(self, string):
         self.wfile.write(string.encode('utf-8'))
 
+    def write_bytes(self, data):
+        self.wfile.write(data)
+
+    # Invariant command prefixes.
+    _OSC_ORIGIN = ('osc', 'origin', '-p')
+    _OSC_RDIFF = ('osc', 'rdiff')
+    _OSC_SR = ('osc', 'sr')
+    _OSC_STAGING = ('osc', 'staging', '-p')
+
     def command_format_add(self, command, query):
-        format = None
-        if self.headers.get('Accept'):
-            format = self.headers.get('Accept').split('/', 2)[1]
-            if format != 'json' and format != 'yaml':
-                format = None
+        accept = self.headers.get('Accept')
+        if accept in ('application/json', 'text/json'):
+            format = 'json'
+        elif accept in ('application/yaml', 'text/yaml'):
+            format = 'yaml'
+        elif accept:
+            format = _accept_format(accept)
+        else:
+            format = None
         if not format and 'format' in query:
             format = query['format'][0]
         if format:
@@ -235,27 +491,27 @@ class RequestHandler(BaseHTTPRequestHandler):
             command.append(format)
 
     def handle_origin_config(self, args, query):
-        command = ['osc', 'origin', '-p', args[0], 'config']
+        command = [*self._OSC_ORIGIN, args[0], 'config']
         if 'origins-only' in query:
             command.append('--origins-only')
         return command
 
     def handle_origin_history(self, args, query):
-        command = ['osc', 'origin', '-p', args[0], 'history']
+        command = [*self._OSC_ORIGIN, args[0], 'history']
         self.command_format_add(command, query)
         if len(args) > 1:
             command.append(args[1])
         return command
 
     def handle_origin_list(self, args, query):
-        command = ['osc', 'origin', '-p', args[0], 'list']
+        command = [*self._OSC_ORIGIN, args[0], 'list']
         if 'force-refresh' in query:
             command.append('--force-refresh')
         self.command_format_add(command, query)
         return command
 
     def handle_origin_package(self, args, query):
-        command = ['osc', 'origin', '-p', args[0], 'package']
+        command = [*self._OSC_ORIGIN, args[0], 'package']
         if 'debug' in query:
             command.append('--debug')
         if len(args) > 1:
@@ -263,7 +519,7 @@ class RequestHandler(BaseHTTPRequestHandler):
         return command
 
     def handle_origin_potentials(self, args, query):
-        command = ['osc', 'origin', '-p', args[0], 'potentials']
+        command = [*self._OSC_ORIGIN, args[0], 'potentials']
         self.command_format_add(command, query)
         if len(args) > 1:
             command.append(args[1])
@@ -275,14 +531,14 @@ class RequestHandler(BaseHTTPRequestHandler):
         return command
 
     def handle_origin_report(self, args, query):
-        command = ['osc', 'origin', '-p', args[0], 'report']
+        command = [*self._OSC_ORIGIN, args[0], 'report']
         if 'force-refresh' in query:
             command.append('--force-refresh')
         return command
 
     def handle_package_diff(self, args, query):
         # source_project source_package target_project [target_package] [source_revision] [target_revision]
-        command = ['osc', 'rdiff', args[0], args[1], args[2]] # len(args) == 3
+        command = [*self._OSC_RDIFF, args[0], args[1], args[2]] # len(args) == 3
         if len(args) >= 4:
             command.append(args[3]) # target_package
         if len(args) >= 5:
@@ -291,7 +547,7 @@ class RequestHandler(BaseHTTPRequestHandler):
         return command
 
     def handle_request_submit(self, args, query, data):
-        command = ['osc', 'sr', args[0], args[1], args[2]]
+        command = [*self._OSC_SR, args[0], args[1], args[2]]
         command.append('-m')
         if 'message' in query and query['message'][0]:
             command.append(query['message'][0])
@@ -301,7 +557,7 @@ class RequestHandler(BaseHTTPRequestHandler):
         return [command]
 
     def staging_command(self, project, subcommand):
-        return ['osc', 'staging', '-p', project, subcommand]
+        return [*self._OSC_STAGING, project, subcommand]
 
     def handle_staging_select(self, args, query, data):
         for staging, requests in data['selection'].items():
@@ -312,6 +568,21 @@ class RequestHandler(BaseHTTPRequestHandler):
             command.extend(requests)
             yield command
 
+    GET_HANDLERS = {
+        'origin/config': handle_origin_config,
+        'origin/history': handle_origin_history,
+        'origin/list': handle_origin_list,
+        'origin/package': handle_origin_package,
+        'origin/potentials': handle_origin_potentials,
+        'origin/projects': handle_origin_projects,
+        'origin/report': handle_origin_report,
+        'package/diff': handle_package_diff,
+    }
+    POST_HANDLERS = {
+        'request/submit': handle_request_submit,
+        'staging/select': handle_staging_select,
+    }
+
 class OSCRequestEnvironment(object):
     def __init__(self, handler, user=None, require_session=True):
         self.handler = handler
@@ -335,9 +606,8 @@ class OSCRequestEnvironment(object):
             self.handler.end_headers()
             raise OSCRequestEnvironmentException('unable to determine session')
 
-        if self.handler.debug:
-            print('apiurl: {}'.format(apiurl))
-            print('session: {}'.format(session))
+        logger.debug('apiurl: %s', apiurl)
+        logger.debug('session: %s', session)
 
         self.handler.send_response(200)
         self.handler.send_header('Content-type', 'text/plain')
@@ -345,11 +615,10 @@ class OSCRequestEnvironment(object):
             self.handler.send_header('Access-Control-Allow-Credentials', 'true')
             self.handler.send_header('Access-Control-Allow-Origin', self.handler.headers.get('Origin'))
 
-        self.cookiejar_file = tempfile.NamedTemporaryFile()
-        self.oscrc_file = tempfile.NamedTemporaryFile()
-
-        self.cookiejar_file.__enter__()
-        self.oscrc_file.__enter__()
+        # Each request has its own cookiejar since osc rewrites it, which would
+        # race with concurrent requests from the same session.
+        self.cookiejar_file = temporary_file('cookiejar')
+        self.oscrc_file = temporary_file('oscrc')
 
         self.handler.oscrc_create(self.oscrc_file, apiurl, self.cookiejar_file, self.user)
         self.handler.cookiejar_create(self.cookiejar_file, session)
@@ -364,29 +633,52 @@ class OSCRequestEnvironmentException(Exception):
     pass
 
 def main(args):
+    # Only adjust the level of this module to avoid enabling output from
+    # libraries (sentry_sdk, urllib3, osc) via the root logger.
+    logging.basicConfig()
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+
     conf.get_config() # Allow sentry DSN to be available.
     sentry_sdk = sentry_init()
 
     RequestHandler.apiurl = args.apiurl
     RequestHandler.session = args.session
-    RequestHandler.debug = args.debug
-
-    with ThreadedHTTPServer((args.host, args.port), RequestHandler) as httpd:
+    RequestHandler.in_process = args.in_process
+    if args.in_process:
+        RequestHandler.forkserver = multiprocessing.get_context('forkserver')
+        RequestHandler.forkserver.set_forkserver_preload(['__main__', 'osc.babysitter', 'osc.commandline'])
+        # Start ahead of the first request.
+        multiprocessing.forkserver.ensure_running()
+    # Immutable once sentry_init() has returned.
+    RequestHandler.sentry_dsn = sentry_client().dsn
+    RequestHandler.sentry_environment = sentry_client().options.get('environment')
+    RequestHandler.oscrc_template = RequestHandler.oscrc_template_build()
+
+    with ThreadPoolHTTPServer((args.host, args.port), RequestHandler, args.workers) as httpd:
         print('listening on {}:{}'.format(args.host, args.port))
         httpd.serve_forever()
 
+def workers_type(value):
+    workers = int(value)
+    if workers < 1:
+        raise argparse.ArgumentTypeError('must be at least 1')
+    return workers
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='OBS Operator server used to perform staging operations.')
     parser.set_defaults(func=main)
 
     parser.add_argument('--host', default='', help='host name to which to bind')
     parser.add_argument('--port', type=int, default=8080, help='port number to which to bind')
+    parser.add_argument('--workers', type=workers_type, default=32, help='number of threads handling requests')
     parser.add_argument('-A', '--apiurl',
         help='OBS instance API URL to use instead of basing from request origin')
     parser.add_argument('--session',
         help='session cookie value to use instead of any passed cookie')
+    parser.add_argument('--in-process', action='store_true',
+        help='execute osc commands in children of a forkserver with osc preloaded instead of a new interpreter')
     parser.add_argument('-d', '--debug', action='store_true',
-        help='print debugging information')
+        help='log debugging information to stderr')
 
     args = parser.parse_args()
     sys.exit(args.func(args))
@@ -0,0 +1,175 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import unittest
+from http.cookiejar import Cookie
+from http.cookiejar import LWPCookieJar
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from obs_operator import _accept_format
+from obs_operator import _domain_parent
+from obs_operator import _extract_session_cookie
+from obs_operator import _parse_query
+from obs_operator import _split_path_prefix
+from obs_operator import _split_path_query
+from obs_operator import RequestHandler
+
+COOKIE_NAME = RequestHandler.COOKIE_NAME
+
+
+def handler_create(headers):
+    # Avoid BaseHTTPRequestHandler.__init__() which handles a request.
+    handler = RequestHandler.__new__(RequestHandler)
+    handler.apiurl = None
+    handler.session = None
+    handler.headers = headers
+    return handler
+
+
+class TestOBSOperator(unittest.TestCase):
+    def test_extract_session_cookie(self):
+        for header_value in [
+            'openSUSE_session=abc123',
+            'a=b; openSUSE_session=abc123; c=d',
+            'openSUSE_session=first; openSUSE_session=last',
+            'openSUSE_session="a;b"; x=1',
+            'openSUSE_session="a\\012b\\\\c"; x="y;z"',
+            'openSUSE_session="a\\"b"',
+            'openSUSE_session=',
+            'other=1',
+        ]:
+            cookie = SimpleCookie(header_value)
+            expected = cookie[COOKIE_NAME].value if COOKIE_NAME in cookie else None
+            self.assertEqual(_extract_session_cookie(header_value, COOKIE_NAME), expected, header_value)
+
+    def test_extract_session_cookie_invalid_key(self):
+        # SimpleCookie fails to provide the session with invalid keys present.
+        self.assertEqual(_extract_session_cookie(
+            'bad[key]=1; openSUSE_session=abc123', COOKIE_NAME), 'abc123')
+        self.assertEqual(_extract_session_cookie(
+            'bad[key]="1"; openSUSE_session="abc123"', COOKIE_NAME), 'abc123')
+
+    def test_session_get_max_length(self):
+        cookie = 'openSUSE_session=abc123'
+        self.assertEqual(handler_create({'Cookie': cookie}).session_get(), 'abc123')
+
+        cookie += '; padding=' + 'x' * RequestHandler.COOKIE_MAX_LENGTH
+        self.assertIsNone(handler_create({'Cookie': cookie}).session_get())
+
+    def test_split_path_query(self):
+        for request_path in [
+            '/',
+            '/origin/config/openSUSE:Factory',
+            '/origin/config/openSUSE:Factory?origins-only=1',
+            '/origin/list/openSUSE:Factory?force-refresh=1#fragment',
+            '/origin/history/openSUSE:Factory/pkg#fragment?format=json',
+            '/origin//config/x',
+            '/request/submit/a/b/c?message=hello+world%21&message=&flag',
+        ]:
+            url_parts = urlparse(request_path)
+            path, query_string = _split_path_query(request_path)
+            self.assertEqual(path, url_parts.path.lstrip('/'), request_path)
+            self.assertEqual(query_string, url_parts.query, request_path)
+
+        # Unlike urlparse() a leading // is not treated as a netloc.
+        self.assertEqual(_split_path_query('//origin//config?a=1'), ('origin//config', 'a=1'))
+
+    def test_parse_query(self):
+        for query_string in [
+            '',
+            'origins-only=1',
+            'origins-only',
+            'origins-only=',
+            'message=hello+world%21',
+            'message=a%2Bb%26c%3Dd',
+            'a=1&a=2&b=3',
+            'a=1&&b=2',
+            '%66ormat=json',
+        ]:
+            self.assertEqual(_parse_query(query_string), parse_qs(query_string), query_string)
+
+    def test_split_path_prefix(self):
+        for path in [
+            '',
+            'origin',
+            'origin/config',
+            'origin/config/',
+            'origin/config/openSUSE:Factory',
+            'origin/history/openSUSE:Factory/pkg/',
+            '/origin/config',
+            'origin//config',
+        ]:
+            path_parts = path.split('/')
+            path_prefix, path_rest = _split_path_prefix(path)
+            self.assertEqual(path_prefix, '/'.join(path_parts[:2]), path)
+            if len(path_parts) < 3:
+                # Short paths result in 404.
+                self.assertIsNone(path_rest, path)
+            else:
+                self.assertEqual(path_rest.split('/'), path_parts[2:], path)
+
+    def test_domain_parent(self):
+        for domain in [
+            'opensuse.org',
+            'build.opensuse.org',
+            'a.b.build.opensuse.org',
+            'localhost',
+            '.org',
+            'build..org',
+        ]:
+            self.assertEqual(_domain_parent(domain), '.'.join(domain.split('.')[-2:]), domain)
+
+    def test_apiurl_get(self):
+        handler = handler_create({'Host': 'build.opensuse.org:443'})
+        self.assertEqual(handler.apiurl_get(), 'https://api.opensuse.org')
+
+        # Single-label hosts cannot be mapped to an api subdomain.
+        self.assertIsNone(handler_create({'Host': 'localhost:8080'}).apiurl_get())
+
+    def test_accept_format(self):
+        self.assertEqual(_accept_format('application/json'), 'json')
+        self.assertEqual(_accept_format('text/yaml'), 'yaml')
+        self.assertEqual(_accept_format('application/json; charset=utf-8'), 'json')
+        self.assertEqual(_accept_format('text/plain, application/yaml;q=0.9'), 'yaml')
+        self.assertIsNone(_accept_format('json'))
+        self.assertIsNone(_accept_format('*/*'))
+        self.assertIsNone(_accept_format(
+            'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'))
+
+    def test_cookiejar_create(self):
+        handler = handler_create({})
+        for session in ['abc123', 'a"b c', None]:
+            with tempfile.NamedTemporaryFile() as expected_file, \
+                 tempfile.NamedTemporaryFile() as cookiejar_file:
+                cookie_jar = LWPCookieJar(expected_file.name)
+                cookie_jar.set_cookie(Cookie(0, COOKIE_NAME, session,
+                    None, False,
+                    '', False, True,
+                    '/', True,
+                    True,
+                    None, None, None, None, {}))
+                cookie_jar.save()
+
+                handler.cookiejar_create(cookiejar_file, session)
+
+                with open(expected_file.name, 'rb') as f:
+                    expected = f.read()
+                with open(cookiejar_file.name, 'rb') as f:
+                    self.assertEqual(f.read(), expected, session)
+
+    def test_execute_in_process(self):
+        handler = handler_create({})
+        handler.forkserver = multiprocessing.get_context('forkserver')
+        oscrc = os.path.join(os.path.dirname(__file__), 'test.oscrc')
+
+        with open(oscrc) as oscrc_file:
+            handler.wfile = io.BytesIO()
+            self.assertTrue(handler.execute_in_process(oscrc_file, ['osc', 'help']))
+            self.assertIn(b'usage', handler.wfile.getvalue().lower())
+
+            handler.wfile = io.BytesIO()
+            self.assertFalse(handler.execute_in_process(oscrc_file, ['osc', 'no-such-command']))
+            self.assertIn(b'no-such-command', handler.wfile.getvalue())